@@ -8,15 +8,18 @@ import traceback
 from collections import namedtuple
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from time import sleep
-from typing import Optional
+from typing import Optional, List, FrozenSet
 
 from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, \
-    StaleElementReferenceException
+    StaleElementReferenceException, TimeoutException
 from selenium.webdriver import ActionChains
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.wait import WebDriverWait
 
 from feedscraper import xpaths, utils
 
@@ -46,6 +49,17 @@ class Reaction(Enum):
     WOW = "wow"
 
 
+def as_fields(fields) -> FrozenSet[Field]:
+    """
+    Normalizes fields given either as Field objects or as their string values, so they can be checked with a single
+    set lookup.
+
+    :param fields: an iterable of Field objects and/or strings
+    :return: a frozenset of the corresponding Field objects
+    """
+    return frozenset(Field(field) for field in fields)
+
+
 Metadata = namedtuple('Metadata', ['user', 'page', 'timestamp'])
 """A namedtuple class that contains user, page and timestamp of a post"""
 Reactions = namedtuple('Reactions', sorted([reaction.name.lower() for reaction in Reaction]))
@@ -62,21 +76,42 @@ def feed_el(driver: WebDriver) -> WebElement:
     return driver.find_element(By.XPATH, xpaths.FEED)
 
 
-def post_el(feed: WebElement, index: int) -> WebElement:
+@lru_cache(maxsize=1024)
+def post_xpath(index: int) -> str:
     """
-    Retrieves a post element from a feed.
+    Builds the XPath query for a post in a feed. Results are cached, since the same indexes are queried over and over.
 
-    :param feed: the feed element the post is in
     :param index: the position of the post in the feed (starting from 0 for the top one and incrementing with each post)
-    :return: the post's WebElement
+    :return: an XPath query string for the post
     """
     if index == 0:
-        return feed.find_element(By.XPATH, xpaths.FIRST_POST)
+        return xpaths.FIRST_POST
     elif index == 1:
-        return feed.find_element(By.XPATH, xpaths.SECOND_POST)
+        return xpaths.SECOND_POST
     else:
         # NTH post retries posts from the third on. XPath indexes start at one.
-        return feed.find_element(By.XPATH, f'{xpaths.NTH_POST}[{index - 1}]')
+        return f'{xpaths.NTH_POST}[{index - 1}]'
+
+
+def post_el(feed: WebElement, index: int) -> WebElement:
+    """
+    Retrieves a post element from a feed.
+
+    :param feed: the feed element the post is in
+    :param index: the position of the post in the feed (starting from 0 for the top one and incrementing with each post)
+    :return: the post's WebElement
+    """
+    return feed.find_element(By.XPATH, post_xpath(index))
+
+
+def post_els(feed: WebElement) -> List[WebElement]:
+    """
+    Retrieves all the post elements currently loaded in a feed, using a single WebDriver call.
+
+    :param feed: the feed element the posts are in
+    :return: a list of the posts' WebElements, ordered from the top of the feed down
+    """
+    return feed.find_elements(By.XPATH, xpaths.POSTS)
 
 
 def is_arrow_ui(post: WebElement) -> bool:
@@ -107,11 +142,12 @@ def timestamp_from_el(time_el: WebElement, driver: WebDriver) -> Optional[dateti
         # Move to time element
         ActionChains(driver).move_to_element(time_el).perform()
         # Get tooltip (sometimes returns more than one) so make sure to take the last, which should be your element
-        popup_el = driver.find_elements(By.XPATH, xpaths.TOOLTIP)[-1]
+        popup_el = WebDriverWait(driver, 5).until(
+            expected_conditions.presence_of_all_elements_located((By.XPATH, xpaths.TOOLTIP)))[-1]
 
         popup_text = popup_el.get_attribute("textContent")
         return datetime.strptime(popup_text, '%A, %B %d, %Y at %I:%M %p')
-    except IndexError:
+    except TimeoutException:
         utils.warning(utils.print_element(time_el))
         raise NoSuchElementException('Unable to find timestamp')
     except ElementNotInteractableException:
@@ -186,6 +222,27 @@ def posting_metadata(post: WebElement, *, driver=None, fields=None) -> Metadata:
         return Metadata(user, page, timestamp)
 
 
+def timestamp(post: WebElement, driver: WebDriver, *, arrow_ui=None) -> Optional[datetime]:
+    """
+    Gets only the post's timestamp from its element. See posting_metadata to get the rest of its metadata as well.
+
+    :param post: post element
+    :param driver: WebDriver browsing the facebook page
+    :param arrow_ui: whether the post uses arrow UI (see is_arrow_ui). Checked on the element if not given.
+    :return: a datetime object of the post's timestamp
+    """
+    metadata = post.find_element(By.XPATH, xpaths.METADATA)
+    if arrow_ui is None:
+        arrow_ui = is_arrow_ui(post)
+
+    if arrow_ui:
+        time_el = metadata.find_element(By.XPATH, xpaths.ArrowUI.TIME_BY_METADATA)
+    else:
+        lower_metadata = metadata.find_element(By.XPATH, xpaths.LOWER_METADATA)
+        time_el = lower_metadata.find_element(By.XPATH, xpaths.NonArrowUI.TIME_BY_LOWER_METADATA)
+    return timestamp_from_el(time_el, driver)
+
+
 def url(post: WebElement) -> str:
     """
     Get post URL from its element
@@ -264,7 +321,11 @@ def reaction_bar_el(post: WebElement) -> WebElement:
 
 def count_reactions_from_button(button_element: WebElement, driver: WebDriver, reaction_name: str):
     ActionChains(driver).move_to_element(button_element).perform()
-    popup_el = driver.find_element(By.XPATH, xpaths.TOOLTIP)
+    try:
+        popup_el = WebDriverWait(driver, 5).until(
+            expected_conditions.presence_of_element_located((By.XPATH, xpaths.TOOLTIP)))
+    except TimeoutException:
+        raise NoSuchElementException(f'Unable to find {reaction_name} tooltip')
     sleep(1)
     reaction_list = popup_el.text.split('\n')[1:]  # first item is reaction_name
 
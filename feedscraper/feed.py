@@ -1,27 +1,92 @@
 import traceback
-from collections import namedtuple
 from datetime import date
-from time import sleep
-from typing import List
+from functools import lru_cache
+from multiprocessing import Manager, Process
+from queue import Empty, Full
+from time import sleep, monotonic
+from typing import List, NamedTuple, Iterable, Tuple, Optional, Iterator
 
+from lxml.html import HtmlElement
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import TimeoutException, JavascriptException
 from selenium.webdriver import ActionChains
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.wait import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
-from feedscraper import utils, extractors
+from feedscraper import utils, extractors, html_extractors, xpaths
 from feedscraper.post import Post
 from feedscraper.extractors import Field
 
 
+@lru_cache(maxsize=None)
+def chromedriver_path() -> str:
+    """
+    Installs the chromedriver matching the local chrome, if needed.
+    The path is only resolved once per process, and reused by every feed created after.
+
+    :return: the path to the chromedriver executable
+    """
+    return ChromeDriverManager().install()
+
+
+class SidebarAd(NamedTuple):
+    """An ad displaying in the sidebar of a feed"""
+    text: str
+    """The advertiser's name"""
+    link: str
+    """The advertised link"""
+
+
+_POST_SELECTOR = '[data-pagelet^="FeedUnit_"]'
+"""CSS selector for the posts in a home feed. Matches the same elements as xpaths.POSTS."""
+
+_WATCH_POSTS_SCRIPT = """
+const [feed, selector] = arguments;
+if (window.feedscraperObserver) {
+    window.feedscraperObserver.disconnect();
+}
+window.feedscraperPosts = [];
+window.feedscraperObserver = new MutationObserver(mutations => {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType !== Node.ELEMENT_NODE) {
+                continue;
+            }
+            if (node.matches(selector)) {
+                window.feedscraperPosts.push(node);
+            }
+            window.feedscraperPosts.push(...node.querySelectorAll(selector));
+        }
+    }
+});
+window.feedscraperObserver.observe(feed, {childList: true, subtree: true});
+"""
+"""JavaScript queueing posts into window.feedscraperPosts as they are added to the given feed element"""
+
+_RENDERED_HTML_SCRIPT = """
+const [elements, xpath] = arguments;
+return elements.map(el => document.evaluate(
+    xpath, el, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null ? el.outerHTML : null);
+"""
+"""JavaScript returning the outer HTML of each of the given elements if it contains the given XPath, or null"""
+
+
 class Feed:
     """
     Represents a facebook feed that can be scrolled to get posts, potentially up to infinity.
     """
+    SCROLL_TIMEOUT = 5
+    """Maximum time, in seconds, to wait for more content to load after scrolling to the bottom"""
+    MIN_SCROLL_TIMEOUT = 0.2
+    """Minimum time, in seconds, to wait for more content to load after scrolling to the bottom"""
     SCROLL_PAUSE = 1.2
+    """Deprecated and unused: scrolling now waits for the page to grow rather than pausing. See SCROLL_TIMEOUT."""
 
-    def __init__(self, email, password, *, data_dir=None):
+    def __init__(self, email, password, *, data_dir=None, driver_path=None):
         """
         logs in to facebook and displays a feed.
 
@@ -30,9 +95,13 @@ class Feed:
         :param data_dir: a directory which will function as a chrome profile, containing cookies and other data.
         Specifying the same data directory over different sessions allows you to simulate characters that use
         facebook over time. If not specified, the session will be isolated.
+        :param driver_path: the path to the chromedriver executable. If not specified, it is installed if needed
+        (see chromedriver_path).
         """
         self.email = email
         self.password = password
+        # Moving average of the time it took content to load after scrolling, used to adapt the scroll timeout
+        self._scroll_latency_ema = 0.3
 
         options = webdriver.ChromeOptions()
         options.add_experimental_option("prefs", {
@@ -40,29 +109,72 @@ class Feed:
         })  # Avoids  "Allow Notification" pop-ups
         if data_dir is not None:
             options.add_argument(f'user-data-dir={data_dir}')
-        self.driver = webdriver.Chrome(ChromeDriverManager().install())
+        self._closed = False
+        if driver_path is None:
+            driver_path = chromedriver_path()
+        self.driver = webdriver.Chrome(service=Service(driver_path), options=options)
         self.actions = ActionChains(self.driver)
 
+        # No implicit wait: it would apply to every lookup, including the ones expected to fail while browsing.
+        # Lookups that need to wait for the page use an explicit WebDriverWait instead.
+        self.driver.implicitly_wait(0)
         self.driver.get("https://www.facebook.com")
-        self.driver.implicitly_wait(0.5)
 
-        try:
-            self.driver.find_element(By.ID, 'email').send_keys(email)
-            self.driver.find_element(By.ID, 'pass').send_keys(password)
-            self.driver.find_element(By.NAME, 'login').click()  # Send mouse click
-            self.driver.implicitly_wait(0.5)
-        except NoSuchElementException:  # Already logged in
-            pass
+        # Fill in and submit the login form in one call. get() returns once the page has loaded, so a missing
+        # form means the user is already logged in.
+        self.driver.execute_script(
+            """
+            const email = document.getElementById('email');
+            const pass = document.getElementById('pass');
+            const login = document.getElementsByName('login')[0];
+            if (email === null || pass === null || login === undefined) {
+                return;
+            }
+            email.value = arguments[0];
+            pass.value = arguments[1];
+            login.click();
+            """,
+            email, password)
+
+    def close(self):
+        """Quits the browser. The feed can't be used after it is closed."""
+        if not self._closed:
+            self._closed = True
+            self.driver.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     def __del__(self):
+        # Fallback for feeds that weren't closed; prefer using the feed as a context manager, or calling close.
+        # Not guaranteed to run, and may run too late (e.g. during interpreter shutdown).
         try:
-            self.driver.quit()
+            if hasattr(self, 'driver'):
+                self.close()
         except ImportError:  # happens if python crushes
             pass
 
+    def evaluate(self, expression):
+        """
+        Evaluates a JavaScript expression in the page through the Chrome DevTools Protocol. This skips the argument
+        and element serialization of execute_script, so it is cheaper for the small, frequent scripts used to scroll.
+
+        :param expression: the JavaScript expression to evaluate
+        :return: the value of the expression (None if it is undefined)
+        :raises JavascriptException: if evaluating the expression threw
+        """
+        response = self.driver.execute_cdp_cmd('Runtime.evaluate', {'expression': expression, 'returnByValue': True})
+        if 'exceptionDetails' in response:
+            details = response['exceptionDetails']
+            raise JavascriptException(details.get('exception', {}).get('description', details.get('text')))
+        return response['result'].get('value')
+
     def get_scroll_position(self):
         """Get the driver's scroll amount"""
-        return self.driver.execute_script("return window.pageYOffset;")
+        return self.evaluate('window.pageYOffset')
 
     def scroll_to_pos(self, pos):
         """
@@ -70,37 +182,117 @@ class Feed:
 
         :param pos: vertical position to scroll to
         """
-        self.driver.execute_script(f"window.scrollTo(0, {pos});")
+        self.evaluate(f'window.scrollTo(0, {pos})')
 
     def scroll_to_bottom(self):
-        """Scroll the web driver to the current bottom of the page, loading more posts."""
-        self.scroll_to_pos('document.body.scrollHeight')
-        sleep(Feed.SCROLL_PAUSE)
+        """
+        Scroll the web driver to the current bottom of the page, loading more posts.
+        Returns once the page grew, or if nothing more was loaded after a timeout adapted to how long loading took
+        so far (between MIN_SCROLL_TIMEOUT and SCROLL_TIMEOUT seconds).
+
+        :return: the height of the page after scrolling
+        """
+        # Scroll and get the height scrolled to in the same call
+        height = self.evaluate('(() => { const height = document.body.scrollHeight; window.scrollTo(0, height); '
+                               'return height; })()')
+        start = monotonic()
+        try:
+            new_height = WebDriverWait(self.driver, self.scroll_timeout(), poll_frequency=0.1).until(
+                lambda driver: self._grown_height(height))
+        except TimeoutException:
+            new_height = height  # Counted as taking the full timeout, so the next timeout grows
+        self._scroll_latency_ema = 0.8 * self._scroll_latency_ema + 0.2 * (monotonic() - start)
+        return new_height
+
+    def scroll_timeout(self):
+        """
+        :return: the time, in seconds, to wait for more content to load after scrolling. Adapted to how long loading
+        took so far, between MIN_SCROLL_TIMEOUT and SCROLL_TIMEOUT.
+        """
+        return min(Feed.SCROLL_TIMEOUT, max(Feed.MIN_SCROLL_TIMEOUT, 3 * self._scroll_latency_ema))
+
+    def _grown_height(self, height):
+        """
+        :param height: a previous height of the page
+        :return: the current height of the page if it is larger than the given one, or None
+        """
+        new_height = self.evaluate('document.body.scrollHeight')
+        return new_height if new_height > height else None
 
     def scroll_to_top(self):
         """Scroll to the top of the page"""
         self.scroll_to_pos(1)
 
-    SidebarAd = namedtuple('SidebarAd', ['text', 'link'])
+    def outer_html(self, elements: List[WebElement]) -> List[str]:
+        """
+        Gets the HTML of several elements in a single WebDriver call, rather than one call per element.
+
+        :param elements: the elements to get the HTML of
+        :return: a list of the elements' outer HTML, in the same order
+        """
+        return self.driver.execute_script('return arguments[0].map(el => el.outerHTML);', elements)
+
+    SidebarAd = SidebarAd  # Kept as a Feed attribute for backwards compatibility
 
     def get_sidebar_ads(self) -> List[SidebarAd]:
         """
         :return: A list of namedtuples for the ads currently displaying in the sidebar,
         containing text and link attributes.
         """
-        ads_text = self.driver.find_elements(
-            By.XPATH, '//a[@aria-label="Advertiser" and @rel="nofollow noopener"]/div/div/div/span')
+        # Read the text of all the ads in the browser, in one call, rather than one call per ad.
+        ads_lines = self.driver.execute_script(
+            """
+            const ads = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const lines = [];
+            for (let i = 0; i < ads.snapshotLength; i++) {
+                lines.push(ads.snapshotItem(i).innerText.trim().split(/\\r?\\n/));
+            }
+            return lines;
+            """,
+            xpaths.SIDEBAR_AD_TEXT)
+
+        return [SidebarAd(*lines) for lines in ads_lines]  # top line is name, bottom is link
+
+
+def _put_unless_stopped(queue, item, stop) -> bool:
+    """
+    Puts an item in a bounded queue, waiting for room in it unless the stop event is set.
 
-        return list(  # convert to list
-            map(lambda lst: Feed.SidebarAd(*lst),  # top line is name, bottom is link
-                map(str.splitlines,  # split to lines
-                    map(lambda el: el.text, ads_text))))  # get text
+    :return: whether the item was put in the queue
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _crawl_account(feed_class, email, password, data_dir, driver_path, fields, queue, stop):
+    """
+    Browses the feed of a single account, putting (email, post attributes) tuples in the queue as posts are parsed.
+    Stops (closing the browser) once the stop event is set.
+    Runs in its own process, started by HomeFeed.crawl_accounts.
+    """
+    if stop.is_set():  # Stopped before this account's turn came
+        return
+    try:
+        with feed_class(email, password, data_dir=data_dir, driver_path=driver_path) as feed:
+            for post in feed.browse(fields):
+                if not _put_unless_stopped(queue, (email, post.__dict__), stop):
+                    break
+    except Exception:
+        utils.error(f'Crawling {email} failed:')
+        utils.error(traceback.format_exc())
 
 
 class HomeFeed(Feed):
     """Feed browsing the home page"""
+    RENDER_TIMEOUT = 1
+    """Maximum time, in seconds, to wait for a new post's content to render before parsing it"""
 
-    def __init__(self, email, password, *, data_dir=None):
+    def __init__(self, email, password, *, data_dir=None, driver_path=None):
         """
         logs in to facebook and displays the home feed.
 
@@ -112,19 +304,66 @@ class HomeFeed(Feed):
         :param data_dir: a directory which will function as a chrome profile, containing cookies and other data.
         Specifying the same data directory over different sessions allows you to simulate characters that use
         facebook over time. If not specified, the session will be isolated.
+        :param driver_path: the path to the chromedriver executable. If not specified, it is installed if needed
+        (see chromedriver_path).
         """
 
-        super(HomeFeed, self).__init__(email, password, data_dir=data_dir)
+        super(HomeFeed, self).__init__(email, password, data_dir=data_dir, driver_path=driver_path)
         # If running in a fresh profile and the user sees arrow-UI headings, the first page will always
         # be an empty welcome screen, and the home button should be pressed to get the feed.
         try:
-            self.driver.find_element(By.XPATH, '//a[@aria-label="Home"]').click()
+            WebDriverWait(self.driver, 0.5).until(
+                expected_conditions.presence_of_element_located((By.XPATH, xpaths.HOME_BUTTON))
+            ).click()
             utils.confirm('Clicked home')
             sleep(3)
-        except NoSuchElementException:
+        except TimeoutException:
             pass
 
-        self.driver.implicitly_wait(5)
+    def _watch_posts(self, feed_el):
+        """
+        Installs a MutationObserver in the page that queues posts as they are added to the feed, so new posts can be
+        collected with _new_posts, in a single call, instead of querying the whole feed for them.
+        Replaces the observer installed by a previous call, if any.
+
+        :param feed_el: the feed element to watch
+        """
+        self.driver.execute_script(_WATCH_POSTS_SCRIPT, feed_el, _POST_SELECTOR)
+
+    def _snapshots(self, post_els: List[WebElement]) -> Iterator[Tuple[WebElement, HtmlElement]]:
+        """
+        Takes lxml snapshots of posts' HTML (see html_extractors), in a single call per check.
+        Posts are added to the feed before their content renders, so each post is snapshotted once it contains its
+        metadata section, and only the posts still pending are checked again. Some posts never get one (e.g.
+        suggestion carousels), so posts still not rendered after RENDER_TIMEOUT seconds are snapshotted as they are.
+
+        :param post_els: the post WebElements to snapshot
+        :return: a generator iterating over (post WebElement, snapshot) tuples, in the order the posts rendered
+        """
+        deadline = monotonic() + HomeFeed.RENDER_TIMEOUT
+        pending = post_els
+        while pending:
+            htmls = self.driver.execute_script(_RENDERED_HTML_SCRIPT, pending, xpaths.METADATA)
+            for post_el, html in zip(pending, htmls):
+                if html is not None:
+                    yield post_el, html_extractors.from_html(html)
+            pending = [post_el for post_el, html in zip(pending, htmls) if html is None]
+
+            if pending and monotonic() >= deadline:
+                utils.warning(f'{len(pending)} posts did not finish rendering, parsing them as they are')
+                for post_el, html in zip(pending, self.outer_html(pending)):
+                    yield post_el, html_extractors.from_html(html)
+                return
+            if pending:
+                sleep(0.1)
+
+    def _new_posts(self) -> List[WebElement]:
+        """
+        :return: the posts added to the feed since the last call (or since _watch_posts was called), emptying the
+        queue. Posts queued more than once are only returned once, and posts removed from the page are left out.
+        """
+        return self.driver.execute_script(
+            'return [...new Set(window.feedscraperPosts.splice(0))].filter(node => node.isConnected);')
 
     def browse(self, fields=None):
         """
@@ -143,58 +382,127 @@ class HomeFeed(Feed):
         :return: a generator iterating over the posts in the feed as post object
         """
 
-        fields = list(Field) if fields is None else fields # If no fields specified set to all
+        # If no fields specified set to all. Normalized once here, so each post only needs set lookups.
+        fields = frozenset(Field) if fields is None else extractors.as_fields(fields)
 
         self.scroll_to_top()
 
         # First, find the feed element
         try:
-            feed_el = self.driver.find_element(By.XPATH, '//div[@role="feed"]')
-        except NoSuchElementException as e:
+            feed_el = WebDriverWait(self.driver, 5).until(
+                expected_conditions.presence_of_element_located((By.XPATH, xpaths.FEED)))
+        except TimeoutException as e:
             utils.error('Could not find feed element!')
             print(e)
             traceback.format_exc()
             exit(1)
 
-        i = 1  # Post index (XPath index starts from 1)
-        post_count = 0  # Count of posts found
+        # Have the page queue posts as they are added to the feed, then get the ones that were already there.
+        self._watch_posts(feed_el)
+        posts = extractors.post_els(feed_el)
+
+        seen = set()  # Posts already generated (a post may be both found and queued if added in between)
+        page_height = 0  # Height of the page after the last scroll
         scroll_fail_count = 0  # Times scrolled to the bottom without finding a post
         # After failing to find any posts after 10 scroll attempts, assume the feed is over and exit.
         while scroll_fail_count < 10:
+            posts = [post for post in posts if post not in seen]
+            if posts:
+                scroll_fail_count = 0
+                seen.update(posts)
+                for post_el, snapshot in self._snapshots(posts):
+                    yield Post.from_home_element(self, post_el, fields=fields, snapshot=snapshot)
+                posts = self._new_posts()
+                continue
+
+            scroll_fail_count += 1  # When this reaches 10 the loop should end.
+            utils.warning(f'{len(seen)} Scroll Fail Count: {scroll_fail_count}')
+
+            # Try to load more posts. Posts added while scrolling waited for the page to grow are already queued.
+            new_height = self.scroll_to_bottom()
+            posts = self._new_posts()
+            if not posts and new_height > page_height:
+                # The page grew, but not with posts yet (e.g. with loading placeholders), so give them time to arrive.
+                try:
+                    posts = WebDriverWait(self.driver, self.scroll_timeout(), poll_frequency=0.1).until(
+                        lambda driver: self._new_posts())
+                except TimeoutException:
+                    utils.warning(f'{len(seen)} No new posts loaded')
+            page_height = new_height
+
+    @classmethod
+    def crawl_accounts(cls, accounts: Iterable[Tuple[str, str, Optional[str]]], fields=None,
+                       n_workers=4) -> Iterator[Tuple[str, dict]]:
+        """
+        Browses the home feeds of several accounts in parallel, each in its own process and browser.
+
+        Since workers are separate processes, scripts calling this should do so under an
+        `if __name__ == '__main__'` guard. Workers only get ahead of the consumer by a few posts, and when iteration
+        stops early (or the generator is closed) they are signaled to stop and close their browsers, which is waited
+        for.
+
+        :param accounts: (email, password, data_dir) tuples of the accounts to browse. data_dir may be None for an
+        isolated session, but no two accounts can share one, since a chrome profile can't be used by two browsers.
+        :param fields: the fields to collect for each post. For a complete list,
+        see the Field enum in the extractors' module. By default, all of them.
+        :param n_workers: the maximum amount of accounts to browse at the same time
+        :return: a generator iterating over (email, post) tuples as posts are found in any of the feeds. Posts are
+        given as dictionaries of their attributes (see Post.__dict__), since Post objects are tied to the browser that
+        found them.
+        :raises ValueError: if two accounts share a data_dir
+        """
+        accounts = list(accounts)
+        data_dirs = [data_dir for _, _, data_dir in accounts if data_dir is not None]
+        if len(set(data_dirs)) != len(data_dirs):
+            raise ValueError('Accounts must not share a data_dir')
+        fields = frozenset(Field) if fields is None else extractors.as_fields(fields)
+        # Resolved once here rather than in each worker, so they don't all install the chromedriver at the same time
+        driver_path = chromedriver_path()
+        return cls._crawl_accounts(accounts, fields, n_workers, driver_path)
+
+    @classmethod
+    def _crawl_accounts(cls, accounts, fields, n_workers, driver_path) -> Iterator[Tuple[str, dict]]:
+        """The generator of crawl_accounts, separate so its arguments are checked when it is called"""
+        with Manager() as manager:
+            # Bounded, so workers only keep browsing as fast as posts are consumed
+            queue = manager.Queue(maxsize=n_workers)
+            stop = manager.Event()
+            # (email, worker process) pairs, reversed since they are started from the end of the list
+            pending = [(email, Process(target=_crawl_account,
+                                       args=(cls, email, password, data_dir, driver_path, fields, queue, stop)))
+                       for email, password, data_dir in reversed(accounts)]
+            running = []  # (email, worker process) pairs of the accounts currently browsed
+
             try:
-                yield Post.from_home_element(
-                    self,
-                    extractors.post_el(feed_el, i),
-                    fields=fields
-                )
-            except NoSuchElementException as e:
-                # Set warning variables
-                scroll_fail_count += 1  # When this reaches 10 the loop should end.
-                load_fail_count = 0
-
-                # Warn
-                utils.warning(f'{post_count} Scroll Fail Count: {scroll_fail_count}')
-                utils.warning(str(e))
-
-                # Try to load more posts
-                self.scroll_to_bottom()
-                sleep(Feed.SCROLL_PAUSE)
-
-                while load_fail_count < 10:  # Try to wait for the post to load in 0.5 seconds intervals
+                while pending or running:
+                    while pending and len(running) < n_workers:
+                        email, process = pending.pop()
+                        process.start()
+                        running.append((email, process))
+
+                    try:
+                        item = queue.get(timeout=1)
+                    except Empty:
+                        # Check for workers that are done. Processes are checked rather than waiting for a message
+                        # from them, since a worker that is killed (or exits) mid-crawl can't send one.
+                        still_running = []
+                        for email, process in running:
+                            if process.is_alive():
+                                still_running.append((email, process))
+                            elif process.exitcode != 0:
+                                utils.error(f'Crawling {email} failed with exit code {process.exitcode}')
+                        running = still_running
+                        continue
+                    yield item
+
+                # Posts put in the queue between checking it and their worker being found done
+                while True:
                     try:
-                        yield Post.from_home_element(
-                            self,
-                            extractors.post_el(feed_el, i),
-                            fields=fields
-                        )
-                        scroll_fail_count = 0
-                        load_fail_count = 0
+                        yield queue.get_nowait()
+                    except Empty:
                         break
-                    except NoSuchElementException as e:
-                        sleep(0.5)
-                        load_fail_count += 1
-                        utils.warning(f'{post_count} Load fail count: {load_fail_count}')
-                        utils.warning(traceback.format_exc())
-                        utils.warning(str(e))
             finally:
-                i += 1
+                # Let workers close their browsers instead of terminating them, which would leave the browsers open
+                stop.set()
+                for email, process in running:
+                    process.join()
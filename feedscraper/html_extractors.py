@@ -0,0 +1,189 @@
+"""
+This module contains extraction functions that work like the ones in the extractors module, but on an lxml snapshot of
+a post's HTML rather than on its live WebElement.
+
+Every call on a WebElement is a roundtrip to the WebDriver, while querying a snapshot happens locally, so fields that
+only need to be read off the page (and not hovered over or clicked) are much faster to extract this way.
+"""
+
+import re
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml.etree import XPath
+from lxml.html import HtmlElement
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.webelement import WebElement
+
+from feedscraper import xpaths
+from feedscraper.extractors import Field, Metadata
+
+BASE_URL = 'https://www.facebook.com/'
+"""URL relative links in a snapshot are resolved against"""
+
+_NON_RENDERED_TAGS = {'script', 'style', 'noscript', 'template', 'head'}
+"""Tags whose contents are never rendered as text"""
+
+# XPath queries used on snapshots, compiled once so they are not re-parsed for every post
+_METADATA = XPath(xpaths.METADATA)
+_LOWER_METADATA = XPath(xpaths.LOWER_METADATA)
+_CHILDREN = XPath('./*')
+_SPONSORED = XPath(xpaths.SPONSORED)
+_RECOMMENDED = XPath(xpaths.RECOMMENDED)
+_LIKE_BUTTON = XPath(xpaths.LIKE_BUTTON)
+_ARROW = XPath(f'{xpaths.METADATA}/{xpaths.ArrowUI.TOP_BY_METADATA}/{xpaths.ArrowUI.ARROW_BY_TOP}')
+_ARROW_TOP_BY_METADATA = XPath(xpaths.ArrowUI.TOP_BY_METADATA)
+_ARROW_USER_BY_TOP = XPath(xpaths.ArrowUI.USER_BY_TOP)
+_ARROW_PAGE_BY_TOP = XPath(xpaths.ArrowUI.PAGE_BY_TOP)
+_ARROW_PERMALINK_BY_METADATA = XPath(xpaths.ArrowUI.PERMALINK_BY_METADATA)
+_NON_ARROW_PAGE_BY_METADATA = XPath(xpaths.NonArrowUI.PAGE_BY_METADATA)
+_NON_ARROW_USER_BY_LOWER_METADATA = XPath(xpaths.NonArrowUI.USER_BY_LOWER_METADATA)
+_NON_ARROW_PERMALINK_BY_METADATA = XPath(xpaths.NonArrowUI.PERMALINK_BY_METADATA)
+
+
+def snapshot(post: WebElement) -> HtmlElement:
+    """
+    Takes a snapshot of a post's current HTML, using a single WebDriver call.
+
+    :param post: post's WebElement
+    :return: the root lxml element of the post's HTML
+    """
+    return from_html(post.get_attribute('outerHTML'))
+
+
+def from_html(html: str) -> HtmlElement:
+    """
+    Parses a post's HTML into a snapshot.
+
+    :param html: the post's outer HTML
+    :return: the root lxml element of the post's HTML
+    """
+    return lxml.html.fromstring(html)
+
+
+def find(el: HtmlElement, xpath: XPath) -> HtmlElement:
+    """
+    Gets the first element matching an XPath query, like WebElement.find_element
+
+    :param el: the element to query from
+    :param xpath: the compiled XPath query
+    :return: the first matching element
+    :raises NoSuchElementException: if there is no matching element
+    """
+    results = xpath(el)
+    if not results:
+        raise NoSuchElementException(f'Unable to locate element in snapshot: {xpath.path}')
+    return results[0]
+
+
+def inner_text(el: HtmlElement) -> str:
+    """
+    Get the text contents of an element, approximating its innerText attribute in the browser: text in scripts,
+    styles and hidden elements is left out, and line breaks become newlines.
+    Unlike innerText, no stylesheets are applied, so only elements hidden by attributes or inline style are left out.
+
+    :param el: a snapshot element
+    :return: the element's visible text
+    """
+    return ''.join(_inner_text_parts(el))
+
+
+def _inner_text_parts(el: HtmlElement):
+    """Generates the pieces of an element's visible text, in order. See inner_text."""
+    if el.tag == 'br':
+        yield '\n'
+        return
+    if el.text:
+        yield el.text
+    for child in el:
+        if isinstance(child.tag, str) and not _is_hidden(child):  # Not a comment, and rendered
+            yield from _inner_text_parts(child)
+        if child.tail:
+            yield child.tail
+
+
+def _is_hidden(el: HtmlElement) -> bool:
+    """Checks if an element's text is never rendered, judging by its tag, attributes and inline style"""
+    style = el.get('style', '').replace(' ', '').lower()
+    return (el.tag in _NON_RENDERED_TAGS or el.get('hidden') is not None
+            or 'display:none' in style or 'visibility:hidden' in style)
+
+
+def is_arrow_ui(post: HtmlElement) -> bool:
+    """
+    Checks if a post's metadata is using "user > group" UI. See xpaths.ArrowUI for a more thorough explanation.
+
+    :param post: a post snapshot
+    :return: a boolean indicating arrow UI usage
+    """
+    return bool(_ARROW(post))
+
+
+def posting_metadata(post: HtmlElement, *, fields=None) -> Metadata:
+    """
+    Gets post's posting user and page from its snapshot. The timestamp is only shown when hovering over the post, so
+    it is always set to None; see extractors.timestamp.
+
+    :param post: post snapshot
+    :param fields: a set of Field objects to scrape (see extractors.as_fields). May contain other fields, though they
+    will be ignored. Fields not specified will be set to None.
+    :return: a Metadata object containing string user and page.
+    """
+    metadata = find(post, _METADATA)
+
+    # One version of heading UI that is sometimes used (user > group)
+    if is_arrow_ui(post):
+        top = find(metadata, _ARROW_TOP_BY_METADATA)
+
+        if Field.USER in fields:
+            user = inner_text(find(top, _ARROW_USER_BY_TOP))
+        else:
+            user = None
+
+        if Field.PAGE in fields:
+            page = inner_text(find(top, _ARROW_PAGE_BY_TOP))
+        else:
+            page = None
+    else:
+        lower_metadata = find(metadata, _LOWER_METADATA)
+        if len(_CHILDREN(lower_metadata)) == 5:  # posted on group
+            if Field.USER in fields:
+                user = inner_text(find(lower_metadata, _NON_ARROW_USER_BY_LOWER_METADATA))
+            else:
+                user = None
+
+            if Field.PAGE in fields:
+                page = inner_text(find(metadata, _NON_ARROW_PAGE_BY_METADATA))
+            else:
+                page = None
+        else:
+            page = None
+            user = inner_text(find(metadata, _NON_ARROW_PAGE_BY_METADATA))
+
+    return Metadata(user, page, None)
+
+
+def url(post: HtmlElement) -> str:
+    """
+    Get post URL from its snapshot
+    :param post: post snapshot
+    :return: post's URL
+    """
+    metadata = find(post, _METADATA)
+    if is_arrow_ui(post):
+        permalink = find(metadata, _ARROW_PERMALINK_BY_METADATA)
+    else:
+        permalink = find(metadata, _NON_ARROW_PERMALINK_BY_METADATA)
+    return re.sub('&.*$', '', urljoin(BASE_URL, permalink.get('href')))
+
+
+def is_sponsored(post: HtmlElement) -> bool:
+    return bool(_SPONSORED(post))
+
+
+def is_recommended(post: HtmlElement) -> bool:
+    return bool(_RECOMMENDED(post))
+
+
+def is_liked(post: HtmlElement) -> bool:
+    return find(post, _LIKE_BUTTON).get('aria-label') == 'Remove Like'
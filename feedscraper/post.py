@@ -6,9 +6,10 @@ import traceback
 from datetime import datetime
 from enum import Enum
 from time import sleep
-from typing import List
+from typing import FrozenSet
 
 from bs4 import BeautifulSoup
+from lxml.html import HtmlElement
 from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, \
     MoveTargetOutOfBoundsException, TimeoutException
 from selenium.webdriver import ActionChains
@@ -17,7 +18,7 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support.wait import WebDriverWait
 
-from feedscraper import extractors
+from feedscraper import extractors, html_extractors
 from feedscraper.extractors import Field, Metadata, Reactions, Reaction
 from feedscraper.utils import warning
 
@@ -126,7 +127,8 @@ class Post:
         return pprint.pformat(self.__dict__)
 
     @staticmethod
-    def from_home_element(feed: 'HomeFeed', post_element: WebElement, fields: List[str]):
+    def from_home_element(feed: 'HomeFeed', post_element: WebElement, fields: FrozenSet[Field],
+                          snapshot: HtmlElement = None):
         """
         Parses a post element from the home feed into a Post object.
 
@@ -135,11 +137,19 @@ class Post:
 
         :param feed: The Feed object that found the post element
         :param post_element: the post WebElement.
-        :param fields: the fields to scrape. See Field class for the full list. Fields not specified will be set to
-        None.
+        :param fields: the fields to scrape, as a set of Field objects (see extractors.as_fields). See Field class for
+        the full list. Fields not specified will be set to None.
+        :param snapshot: an lxml snapshot of the post element's HTML (see html_extractors), if one was already taken.
 
         :return: A Post object containing all the specified fields, parsed from the given WebElement.
         """
+        fields = extractors.as_fields(fields)
+
+        # Fields that are only read off the page are extracted from a snapshot of the post's HTML, taken in one
+        # WebDriver call. Fields that require hovering or clicking are extracted from the live element.
+        if snapshot is None:
+            snapshot = html_extractors.snapshot(post_element)
+
         start = datetime.now()
 
         # Generally the structure for each field is
@@ -155,10 +165,16 @@ class Post:
         # ```
 
         # Don't scrape metadata if none of the fields it contains are specified
-        metadata_fields = [Field.USER, Field.PAGE, Field.TIMESTAMP]
-        if set(metadata_fields + [field.value for field in metadata_fields]).intersection(set(fields)):
+        if fields.intersection([Field.USER, Field.PAGE, Field.TIMESTAMP]):
             try:
-                metadata = extractors.posting_metadata(post_element, driver=feed.driver, fields=fields)
+                metadata = html_extractors.posting_metadata(snapshot, fields=fields)
+                if Field.TIMESTAMP in fields:
+                    arrow_ui = html_extractors.is_arrow_ui(snapshot)
+                    try:
+                        timestamp = extractors.timestamp(post_element, feed.driver, arrow_ui=arrow_ui)
+                    except NoSuchElementException:
+                        timestamp = None
+                    metadata = metadata._replace(timestamp=timestamp)
             except NoSuchElementException:
                 metadata = Metadata(None, None, None)
                 traceback.format_exc()
@@ -167,9 +183,9 @@ class Post:
         else:
             metadata = Metadata(None, None, None)
 
-        if Field.SPONSORED.value in fields or Field.SPONSORED in fields:
+        if Field.SPONSORED in fields:
             try:
-                sponsored = extractors.is_sponsored(post_element)
+                sponsored = html_extractors.is_sponsored(snapshot)
             except NoSuchElementException:
                 sponsored = None
             print('Sponsored: ' + str(datetime.now() - start))
@@ -177,9 +193,9 @@ class Post:
         else:
             sponsored = None
 
-        if Field.RECOMMENDED.value in fields or Field.SPONSORED in fields:
+        if Field.RECOMMENDED in fields:
             try:
-                recommended = extractors.is_recommended(post_element)
+                recommended = html_extractors.is_recommended(snapshot)
             except NoSuchElementException:
                 recommended = None
             print('Recommended: ' + str(datetime.now() - start))
@@ -187,7 +203,7 @@ class Post:
         else:
             recommended = None
 
-        if Field.TEXT.value in fields or Field.TEXT in fields:
+        if Field.TEXT in fields:
             try:
                 text = extractors.text(post_element)
             except NoSuchElementException:
@@ -199,14 +215,14 @@ class Post:
 
         try:
             like_el = extractors.like_el(post_element)
-            liked = extractors.is_liked_by_button(like_el) if Field.LIKED.value in fields else None
+            liked = html_extractors.is_liked(snapshot) if Field.LIKED in fields else None
         except NoSuchElementException:
             like_el = None
             liked = None
         print('Like: ' + str(datetime.now() - start))
         start = datetime.now()
 
-        if Field.REACTIONS.value in fields or Field.REACTIONS in fields:
+        if Field.REACTIONS in fields:
             try:
                 reactions = extractors.reactions(post_element, feed.driver)
             except NoSuchElementException:
@@ -218,9 +234,14 @@ class Post:
         else:
             reactions = Reactions(*[None] * len(Reaction))
 
-        if Field.URL.value in fields or Field.URL in fields:
+        if Field.URL in fields:
             try:
-                url = extractors.url(post_element)
+                # Facebook only fills in the permalink once the timestamp is hovered, which happens after the
+                # snapshot is taken, so in that case it is read off the live element.
+                if Field.TIMESTAMP in fields:
+                    url = extractors.url(post_element)
+                else:
+                    url = html_extractors.url(snapshot)
             except NoSuchElementException:
                 url = None
             print('URL: ' + str(datetime.now() - start))
@@ -91,12 +91,20 @@ IS_TOOLTIP = equals(Attr.ROLE, 'tooltip')
 FEED = f'//*[{equals(Attr.ROLE, "feed")}]'
 """XPath query for a facebook feed"""
 
+HOME_BUTTON = f'//a[{equals(Attr.ARIA_LABEL, "Home")}]'
+"""XPath query for the home button in the top bar"""
+
+SIDEBAR_AD_TEXT = f'//a[{equals(Attr.ARIA_LABEL, "Advertiser")} and @rel="nofollow noopener"]/div/div/div/span'
+"""XPath query for the text of the ads in the sidebar. The top line is the advertiser and the bottom one its link."""
+
 FIRST_POST = '//*[' + equals(Attr.DATA_PAGELET, 'FeedUnit_0') + ']'
 """XPath query for the first post in a home feed"""
 SECOND_POST = '//*[' + equals(Attr.DATA_PAGELET, 'FeedUnit_1') + ']'
 """XPath query for the second post in a home feed"""
 NTH_POST = '//*[' + equals(Attr.DATA_PAGELET, 'FeedUnit_{n}') + ']'
 """XPath query for the posts in a facebook home feed, from the third onwards"""
+POSTS = f'{FIRST_POST} | {SECOND_POST} | {NTH_POST}'
+"""XPath query for all the posts currently loaded in a home feed, in the order they appear"""
 
 # Consistency #2:
 # The top section of the post, which contains metadata such as time, user and page, is always in a div element of
@@ -73,5 +73,5 @@ def pick_and_run(feed):
 if __name__ == '__main__':
     user = 'Example A'
     email, password = get_login(user)
-    feed = HomeFeed(email, password, data_dir=f'data/{user.replace(" ", "_")}')
-    pick_and_run(feed)
+    with HomeFeed(email, password, data_dir=f'data/{user.replace(" ", "_")}') as feed:
+        pick_and_run(feed)